@@ -21,7 +21,9 @@
 #
 
 import asyncio
+import concurrent.futures
 import datetime
+import errno
 import fcntl
 import functools
 import grp
@@ -34,6 +36,7 @@ import shutil
 import stat
 import string
 import subprocess
+import tarfile
 import tempfile
 import termios
 import time
@@ -48,6 +51,12 @@ QUEUE_ERROR = "ERROR"
 
 QUEUE_FINISHED = "FINISHED"
 
+# how many already-encrypted chunk files may wait in the temporary
+# directory for the sender; bounds disk usage of staged chunks
+# (chunk_size each), while still letting encryption run ahead of
+# (usually slower) sending
+SEND_QUEUE_MAX_CHUNKS = 10
+
 HEADER_FILENAME = 'backup-header'
 DEFAULT_CRYPTO_ALGORITHM = 'aes-256-cbc'
 # 'scrypt' is not exactly HMAC algorithm, but a tool we use to
@@ -64,8 +73,88 @@ HMAC_MAX_SIZE = 4096
 
 BLKSIZE = 512
 
+# buffer size for the tar -> scrypt stream copy; a power-of-two multiple
+# of any common filesystem block size, so reads stay block-aligned
+STREAM_BUFFER_SIZE = 1024 * 1024
+
 _re_alphanum = re.compile(r'^[A-Za-z0-9-]*$')
 
+# characters let through when sanitizing subprocess stderr for error
+# messages; precomputed set - membership is O(1), unlike scanning
+# string.printable for every character
+_safe_stderr_chars = frozenset(string.printable) - frozenset('\r\n%{}')
+
+
+@functools.lru_cache(maxsize=None)
+def _local_user():
+    '''Name of the main dom0 user - the first member of the 'qubes' group.
+
+    Cached: the lookup goes through NSS and the membership cannot change
+    while the daemon runs.
+    '''
+    return grp.getgrnam('qubes').gr_mem[0]
+
+
+@functools.lru_cache(maxsize=None)
+def _getpwnam(user):
+    '''Cached passwd entry lookup for *user*.'''
+    return pwd.getpwnam(user)
+
+
+@functools.lru_cache(maxsize=None)
+def _abs_base_dir():
+    '''Absolute qubes base directory (with trailing slash), resolved once -
+    it cannot change at runtime, while FileToBackup needs it for every
+    backed up file.'''
+    return os.path.abspath(qubes.config.qubes_base_dir) + '/'
+
+
+def _fix_home_ownership(user, directory):
+    '''Chown *directory* recursively to *user*.
+
+    When running as root (the usual case - qubesd) the tree is walked
+    in-process and only entries not already owned by *user* are chowned,
+    which skips the fork and avoids needless ctime churn. Otherwise fall
+    back to 'sudo chown', with the top-level entries split between a few
+    concurrent chown processes, so a large home does not serialize on one
+    traversal. Symlinks are never followed.
+    '''
+    if os.getuid() == 0:
+        uid = _getpwnam(user).pw_uid
+
+        def chown_one(path):
+            try:
+                path_st = os.lstat(path)
+            except OSError:
+                return
+            if path_st.st_uid != uid:
+                os.lchown(path, uid, -1)
+
+        chown_one(directory)
+        for dirpath, dirnames, filenames in os.walk(directory):
+            for name in dirnames + filenames:
+                chown_one(os.path.join(dirpath, name))
+        return
+
+    try:
+        entries = os.listdir(directory)
+    except OSError:
+        entries = []
+    # the directory itself, non-recursively...
+    commands = [['sudo', 'chown', '-h', user, directory]]
+    # ...and its content, divided between a few recursive workers
+    workers = 4
+    for i in range(workers):
+        batch = entries[i::workers]
+        if batch:
+            commands.append(['sudo', 'chown', '-Rh', user] +
+                            [os.path.join(directory, name) for name in batch])
+    # pylint: disable=consider-using-with
+    processes = [subprocess.Popen(command) for command in commands]
+    for process, command in zip(processes, commands):
+        if process.wait():
+            raise subprocess.CalledProcessError(process.returncode, command)
+
 
 class BackupCanceledError(qubes.exc.QubesException):
     def __init__(self, msg, tmpdir=None):
@@ -121,6 +210,40 @@ class BackupHeader:
                 f_header.write("{!s}={!s}\n".format(key, getattr(self, attr)))
 
 
+def _write_all(fd, data):
+    '''Write all *data* to *fd*, handling partial writes.
+
+    :return: number of bytes written
+    '''
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+    return len(data)
+
+
+def _splice_file(out_fd, in_fd, size):
+    '''Copy *size* bytes from *in_fd* to *out_fd*, preferably in-kernel with
+    os.sendfile, falling back to a read/write loop if the kernel refuses
+    the descriptor pair.
+
+    :return: number of bytes copied
+    '''
+    offset = 0
+    while offset < size:
+        try:
+            sent = os.sendfile(out_fd, in_fd, offset, size - offset)
+        except OSError as err:
+            if err.errno not in (errno.EINVAL, errno.ENOSYS):
+                raise
+            buf = os.pread(in_fd, min(size - offset, 409600), offset)
+            sent = _write_all(out_fd, buf)
+        if not sent:
+            raise qubes.exc.QubesException(
+                'premature EOF while sending backup file')
+        offset += sent
+    return offset
+
+
 class SendWorker:
     # pylint: disable=too-few-public-methods
     def __init__(self, queue, base_dir, backup_stdout):
@@ -130,34 +253,72 @@ class SendWorker:
         self.backup_stdout = backup_stdout
         self.log = logging.getLogger('qubes.backup')
 
+    def _send_files(self, filenames):
+        '''Write *filenames* (relative to base_dir) to the backup output as
+        members of a plain tar archive.
+
+        Runs in an executor thread - uses blocking writes and in-kernel
+        os.sendfile for file content, instead of forking tar for every
+        chunk. The resulting stream is as simple and featureless as the
+        'tar -cO --posix' it replaces. It will not be verified before
+        untaring.
+        '''
+        if isinstance(self.backup_stdout, int):
+            out_fd = self.backup_stdout
+        else:
+            out_fd = self.backup_stdout.fileno()
+        written = 0
+        for filename in filenames:
+            with open(os.path.join(self.base_dir, filename),
+                      'rb') as input_file:
+                file_stat = os.fstat(input_file.fileno())
+                # each chunk is read exactly once, start to end - let the
+                # kernel read ahead aggressively
+                os.posix_fadvise(input_file.fileno(), 0, 0,
+                                 os.POSIX_FADV_SEQUENTIAL)
+                tar_info = tarfile.TarInfo(filename)
+                tar_info.size = file_stat.st_size
+                tar_info.mtime = file_stat.st_mtime
+                tar_info.mode = stat.S_IMODE(file_stat.st_mode)
+                tar_info.uid = file_stat.st_uid
+                tar_info.gid = file_stat.st_gid
+                written += _write_all(
+                    out_fd, tar_info.tobuf(tarfile.PAX_FORMAT))
+                written += _splice_file(
+                    out_fd, input_file.fileno(), file_stat.st_size)
+                padding = -file_stat.st_size % tarfile.BLOCKSIZE
+                if padding:
+                    written += _write_all(out_fd, bytes(padding))
+        # end-of-archive marker, padded to the record size like tar does
+        written += _write_all(out_fd, bytes(2 * tarfile.BLOCKSIZE))
+        _write_all(out_fd, bytes(-written % tarfile.RECORDSIZE))
+
     async def run(self):
         self.log.debug("Started sending thread")
 
         while True:
-            filename = await self.queue.get()
-            if filename in (QUEUE_FINISHED, QUEUE_ERROR):
+            item = await self.queue.get()
+            if item in (QUEUE_FINISHED, QUEUE_ERROR):
                 break
 
-            self.log.debug("Sending file {}".format(filename))
-            # This tar used for sending data out need to be as simple, as
-            # simple, as featureless as possible. It will not be
-            # verified before untaring.
-            tar_final_cmd = ["tar", "-cO", "--posix",
-                             "-C", self.base_dir, filename]
-            final_proc = await asyncio.create_subprocess_exec(
-                *tar_final_cmd,
-                stdout=self.backup_stdout)
-            retcode = await final_proc.wait()
-            if retcode >= 2:
-                # handle only exit code 2 (tar fatal error) or
-                # greater (call failed?)
+            # allow queueing a batch of small files (like backup-header and
+            # its hmac) as a single item, to send them in one archive
+            filenames = list(item) if isinstance(item, (list, tuple)) \
+                else [item]
+
+            self.log.debug("Sending files %s", filenames)
+            try:
+                await asyncio.get_event_loop().run_in_executor(
+                    None, self._send_files, filenames)
+            except OSError:
                 raise qubes.exc.QubesException(
                     "ERROR: Failed to write the backup, out of disk space? "
                     "Check console output or ~/.xsession-errors for details.")
 
-            # Delete the file as we don't need it anymore
-            self.log.debug("Removing file {}".format(filename))
-            os.remove(os.path.join(self.base_dir, filename))
+            # Delete the files as we don't need them anymore
+            for filename in filenames:
+                self.log.debug("Removing file %s", filename)
+                os.remove(os.path.join(self.base_dir, filename))
 
         self.log.debug("Finished sending thread")
 
@@ -249,8 +410,11 @@ class Backup:
     # pylint: disable=too-many-instance-attributes
     class FileToBackup:
         # pylint: disable=too-few-public-methods
+        # fixed, compact layout - a backup can hold a lot of these
+        __slots__ = ('path', 'size', 'subdir', 'name', 'cleanup_func')
+
         def __init__(self, file_path_or_func, subdir=None, name=None, size=None,
-                     cleanup_func=None):
+                     cleanup_func=None, usage_cache=None):
             """Store a single file to backup
 
             :param file_path_or_func: path to the file or a function
@@ -262,6 +426,9 @@ class Backup:
             :param size: size
             :param cleanup_func: function to call after processing the file;
                 the function will get the file path as an argument
+            :param usage_cache: dict memoizing disk usage per path, to avoid
+                walking the same tree multiple times within one backup
+                preparation
             """
             if callable(file_path_or_func):
                 assert subdir is not None \
@@ -269,12 +436,18 @@ class Backup:
                        and size is not None
 
             if size is None:
-                size = qubes.storage.file.get_disk_usage(file_path_or_func)
+                if usage_cache is not None \
+                        and file_path_or_func in usage_cache:
+                    size = usage_cache[file_path_or_func]
+                else:
+                    size = qubes.storage.file.get_disk_usage(
+                        file_path_or_func)
+                    if usage_cache is not None:
+                        usage_cache[file_path_or_func] = size
 
             if subdir is None:
                 abs_file_path = os.path.abspath(file_path_or_func)
-                abs_base_dir = os.path.abspath(
-                    qubes.config.system_path["qubes_base_dir"]) + '/'
+                abs_base_dir = _abs_base_dir()
                 abs_file_dir = os.path.dirname(abs_file_path) + '/'
                 (nothing, directory, subdir) = \
                     abs_file_dir.partition(abs_base_dir)
@@ -300,6 +473,8 @@ class Backup:
 
     class VMToBackup:
         # pylint: disable=too-few-public-methods
+        __slots__ = ('vm', 'files', 'subdir')
+
         def __init__(self, vm, files, subdir):
             self.vm = vm
             self.files = files
@@ -307,7 +482,7 @@ class Backup:
 
         @property
         def size(self):
-            return functools.reduce(lambda x, y: x + y.size, self.files, 0)
+            return sum(f.size for f in self.files)
 
     def __init__(self, app, vms_list=None, exclude_list=None, **kwargs):
         """
@@ -371,11 +546,31 @@ class Backup:
         self._files_to_backup = self.get_files_to_backup()
 
     def __del__(self):
-        if self.tmpdir and os.path.exists(self.tmpdir):
-            shutil.rmtree(self.tmpdir)
+        if self.tmpdir:
+            shutil.rmtree(self.tmpdir, ignore_errors=True)
 
     def get_files_to_backup(self):
         files_to_backup = {}
+        # share disk usage results between all files of this backup
+        usage_cache = {}
+
+        # probe usage of file-backed volumes up front and in parallel -
+        # every such probe walks the volume's files, so on systems with
+        # many large VMs doing it sequentially dominates preparation
+        # time; other pool types answer from pool metadata (lvm_thin
+        # through a time-based cache with no thread synchronization) and
+        # are read serially in the loop below
+        with concurrent.futures.ThreadPoolExecutor(max_workers=8) as pool:
+            usage_futures = {
+                volume: pool.submit(getattr, volume, 'usage')
+                for vm in self.vms_for_backup if vm.qid != 0
+                for volume in vm.volumes.values()
+                if volume.save_on_stop
+                and isinstance(volume, qubes.storage.file.FileVolume)
+            }
+            volume_usage = {volume: future.result()
+                            for volume, future in usage_futures.items()}
+
         for vm in self.vms_for_backup:
             if vm.qid == 0:
                 # handle dom0 later
@@ -387,26 +582,31 @@ class Backup:
             for name, volume in vm.volumes.items():
                 if not volume.save_on_stop:
                     continue
+                usage = volume_usage[volume] if volume in volume_usage \
+                    else volume.usage
                 vm_files.append(self.FileToBackup(
                     volume.export,
                     subdir,
                     name + '.img',
-                    volume.usage,
+                    usage,
                     cleanup_func=volume.export_end))
 
-            vm_files.extend(self.FileToBackup(i, subdir)
+            vm_files.extend(self.FileToBackup(i, subdir,
+                                              usage_cache=usage_cache)
                 for i in vm.fire_event('backup-get-files'))
 
             firewall_conf = os.path.join(vm.dir_path, vm.firewall_conf)
             if os.path.exists(firewall_conf):
-                vm_files.append(self.FileToBackup(firewall_conf, subdir))
+                vm_files.append(self.FileToBackup(firewall_conf, subdir,
+                                                  usage_cache=usage_cache))
 
             if not vm_files:
                 # subdir/ is needed in the tar file, otherwise restore
                 # of a (Disp)VM without any backed up files is going
                 # to fail. Adding a zero-sized file here happens to be
                 # more straightforward than adding an empty directory.
-                empty = self.FileToBackup("/var/run/qubes/empty", subdir)
+                empty = self.FileToBackup("/var/run/qubes/empty", subdir,
+                                          usage_cache=usage_cache)
                 assert empty.size == 0
                 vm_files.append(empty)
 
@@ -414,69 +614,66 @@ class Backup:
 
         # Dom0 user home
         if 0 in [vm.qid for vm in self.vms_for_backup]:
-            local_user = grp.getgrnam('qubes').gr_mem[0]
-            home_dir = pwd.getpwnam(local_user).pw_dir
+            local_user = _local_user()
+            home_dir = _getpwnam(local_user).pw_dir
             # Home dir should have only user-owned files, so fix it now
             # to prevent permissions problems - some root-owned files can
             # left after 'sudo bash' and similar commands
-            subprocess.check_call(['sudo', 'chown', '-R', local_user, home_dir])
+            _fix_home_ownership(local_user, home_dir)
 
             home_to_backup = [
-                self.FileToBackup(home_dir, 'dom0-home/')]
+                self.FileToBackup(home_dir, 'dom0-home/',
+                                  usage_cache=usage_cache)]
             vm_files = home_to_backup
 
             files_to_backup[0] = self.VMToBackup(self.app.domains[0],
                 vm_files,
                 os.path.join('dom0-home', os.path.basename(home_dir)))
 
-        self.total_backup_bytes = functools.reduce(
-            lambda x, y: x + y.size, files_to_backup.values(), 0)
+        self.total_backup_bytes = sum(
+            vm_info.size for vm_info in files_to_backup.values())
         return files_to_backup
 
 
     def get_backup_summary(self):
-        summary = ""
-
         fields_to_display = [
             {"name": "VM", "width": 16},
             {"name": "type", "width": 12},
             {"name": "size", "width": 12}
         ]
 
+        # build all row format strings once, instead of re-deriving them
+        # for every VM in the loop below
+        separator_line = ''.join(
+            '-' * (field["width"] + 1) + '-+' for field in fields_to_display
+        ) + "\n"
+        field_fmts = ["{{0:>{0}}} |".format(field["width"] + 1)
+                      for field in fields_to_display]
+        total_fmt = "{{0:>{0}}} |".format(
+            fields_to_display[1]["width"] + 1 + 2 + fields_to_display[2][
+                "width"] + 1)
+
         # Display the header
-        for field in fields_to_display:
-            fmt = "{{0:-^{0}}}-+".format(field["width"] + 1)
-            summary += fmt.format('-')
-        summary += "\n"
-        for field in fields_to_display:
-            fmt = "{{0:>{0}}} |".format(field["width"] + 1)
-            summary += fmt.format(field["name"])
-        summary += "\n"
-        for field in fields_to_display:
-            fmt = "{{0:-^{0}}}-+".format(field["width"] + 1)
-            summary += fmt.format('-')
+        summary = separator_line
+        summary += ''.join(fmt.format(field["name"])
+            for fmt, field in zip(field_fmts, fields_to_display))
         summary += "\n"
+        summary += separator_line
 
         files_to_backup = self._files_to_backup
 
         for qid, vm_info in files_to_backup.items():
-            summary_line = ""
-            fmt = "{{0:>{0}}} |".format(fields_to_display[0]["width"] + 1)
-            summary_line += fmt.format(vm_info.vm.name)
+            summary_line = field_fmts[0].format(vm_info.vm.name)
 
-            fmt = "{{0:>{0}}} |".format(fields_to_display[1]["width"] + 1)
             if qid == 0:
-                summary_line += fmt.format("User home")
+                summary_line += field_fmts[1].format("User home")
             elif isinstance(vm_info.vm, qubes.vm.templatevm.TemplateVM):
-                summary_line += fmt.format("Template VM")
+                summary_line += field_fmts[1].format("Template VM")
             else:
-                summary_line += fmt.format("VM" + (" + Sys" if
+                summary_line += field_fmts[1].format("VM" + (" + Sys" if
                     vm_info.vm.updateable else ""))
 
-            vm_size = vm_info.size
-
-            fmt = "{{0:>{0}}} |".format(fields_to_display[2]["width"] + 1)
-            summary_line += fmt.format(size_to_human(vm_size))
+            summary_line += field_fmts[2].format(size_to_human(vm_info.size))
 
             if qid != 0 and vm_info.vm.is_running():
                 summary_line += " <-- The VM is running, backup will contain " \
@@ -484,23 +681,13 @@ class Backup:
 
             summary += summary_line + "\n"
 
-        for field in fields_to_display:
-            fmt = "{{0:-^{0}}}-+".format(field["width"] + 1)
-            summary += fmt.format('-')
-        summary += "\n"
+        summary += separator_line
 
-        fmt = "{{0:>{0}}} |".format(fields_to_display[0]["width"] + 1)
-        summary += fmt.format("Total size:")
-        fmt = "{{0:>{0}}} |".format(
-            fields_to_display[1]["width"] + 1 + 2 + fields_to_display[2][
-                "width"] + 1)
-        summary += fmt.format(size_to_human(self.total_backup_bytes))
+        summary += field_fmts[0].format("Total size:")
+        summary += total_fmt.format(size_to_human(self.total_backup_bytes))
         summary += "\n"
 
-        for field in fields_to_display:
-            fmt = "{{0:-^{0}}}-+".format(field["width"] + 1)
-            summary += fmt.format('-')
-        summary += "\n"
+        summary += separator_line
 
         vms_not_for_backup = [vm.name for vm in self.app.domains
                               if vm not in self.vms_for_backup]
@@ -591,35 +778,37 @@ class Backup:
                 )
 
                 self.log.debug(
-                    "handle_streams returned: {}".format(run_error))
+                    "handle_streams returned: %s", run_error)
             except:
                 scrypt.terminate()
                 raise
 
             scrypt.stdin.close()
             await scrypt.wait()
-            self.log.debug("scrypt return code: {}".format(
-                scrypt.returncode))
+            self.log.debug("scrypt return code: %d", scrypt.returncode)
 
             # Send the chunk to the backup target
             await output_queue.put(
                 os.path.relpath(chunkfile, self.tmpdir))
 
     async def _wrap_and_send_files(self, files_to_backup, output_queue):
+        files_to_backup = list(files_to_backup)
+        # create all staging subdirectories in one sweep up front,
+        # instead of a makedirs round-trip before every file
+        for subdir in {file_info.subdir
+                       for vm_info in files_to_backup
+                       for file_info in vm_info.files}:
+            os.makedirs(os.path.join(self.tmpdir, subdir), exist_ok=True)
+
         for vm_info in files_to_backup:
             for file_info in vm_info.files:
 
-                self.log.debug("Backing up {}".format(file_info))
+                self.log.debug("Backing up %s", file_info)
 
                 backup_tempfile = os.path.join(
                     self.tmpdir, file_info.subdir,
                     file_info.name)
-                self.log.debug("Using temporary location: {}".format(
-                    backup_tempfile))
-
-                # Ensure the temporary directory exists
-                if not os.path.isdir(os.path.dirname(backup_tempfile)):
-                    os.makedirs(os.path.dirname(backup_tempfile))
+                self.log.debug("Using temporary location: %s", backup_tempfile)
 
                 # The first tar cmd can use any complex feature as we want.
                 # Files will be verified before untaring this.
@@ -628,18 +817,19 @@ class Backup:
                 path = file_info.path
                 if callable(path):
                     path = await qubes.utils.coro_maybe(path())
+                path_dirname, path_basename = os.path.split(path)
                 tar_cmdline = (["tar", "-Pc", '--sparse',
-                                '-C', os.path.dirname(path)] +
+                                '-C', path_dirname] +
                                (['--dereference'] if
                                file_info.subdir != "dom0-home/" else []) +
                                ['--xform=s:^%s:%s\\0:' % (
-                                   os.path.basename(path),
+                                   path_basename,
                                    file_info.subdir),
-                                   os.path.basename(path)
+                                   path_basename
                                ])
                 file_stat = os.stat(path)
                 if stat.S_ISBLK(file_stat.st_mode) or \
-                        file_info.name != os.path.basename(path):
+                        file_info.name != path_basename:
                     # tar doesn't handle content of block device, use our
                     # writer
                     # also use our tar writer when renaming file
@@ -703,8 +893,7 @@ class Backup:
                 proc_stderr = (await proc.stderr.read())
                 proc_stderr = proc_stderr.decode('ascii', errors='ignore')
                 proc_stderr = ''.join(
-                    c for c in proc_stderr if c in string.printable and
-                                              c not in '\r\n%{}')
+                    c for c in proc_stderr if c in _safe_stderr_chars)
                 error_message += ': ' + proc_stderr
             raise qubes.exc.QubesException(error_message)
 
@@ -744,9 +933,10 @@ class Backup:
 
         for qid, vm_info in files_to_backup.items():
             # VM is included in the backup
-            backup_app.domains[qid].features['backup-content'] = True
-            backup_app.domains[qid].features['backup-path'] = vm_info.subdir
-            backup_app.domains[qid].features['backup-size'] = vm_info.size
+            features = backup_app.domains[qid].features
+            features['backup-content'] = True
+            features['backup-path'] = vm_info.subdir
+            features['backup-size'] = vm_info.size
         backup_app.save()
         del backup_app
 
@@ -771,26 +961,25 @@ class Backup:
             else:
                 backup_target = self.target_dir
 
-                # Create the target directory
-                if not os.path.exists(os.path.dirname(self.target_dir)):
-                    raise qubes.exc.QubesException(
-                        "ERROR: the backup directory for {0} does not exists".
-                        format(self.target_dir))
-
             # If not APPVM, STDOUT is a local file
-            backup_stdout = open(backup_target, 'wb')
+            try:
+                backup_stdout = open(backup_target, 'wb')
+            except FileNotFoundError:
+                raise qubes.exc.QubesException(
+                    "ERROR: the backup directory for {0} does not exists".
+                    format(self.target_dir))
 
         # Tar with tape length does not deals well with stdout
         # (close stdout between two tapes)
         # For this reason, we will use named pipes instead
-        self.log.debug("Working in {}".format(self.tmpdir))
+        self.log.debug("Working in %s", self.tmpdir)
 
-        self.log.debug("Will backup: {}".format(files_to_backup))
+        self.log.debug("Will backup: %s", files_to_backup)
 
         header_files = await self._prepare_backup_header()
 
         # Setup worker to send encrypted data chunks to the backup_target
-        to_send = asyncio.Queue(10)
+        to_send = asyncio.Queue(SEND_QUEUE_MAX_CHUNKS)
         send_proc = SendWorker(to_send, self.tmpdir, backup_stdout)
         send_task = asyncio.ensure_future(send_proc.run())
 
@@ -803,8 +992,8 @@ class Backup:
             asyncio.ensure_future(self._cancel_on_error(
                 vmproc_task, send_task))
 
-        for file_name in header_files:
-            await to_send.put(file_name)
+        # both header files are tiny - send them as a single batch
+        await to_send.put(header_files)
 
         qubes_xml_info = self.VMToBackup(
             None,
@@ -845,7 +1034,11 @@ class Backup:
                 if vmproc_task:
                     await vmproc_task
             finally:
-                shutil.rmtree(self.tmpdir)
+                # may still hold staged chunks - don't block the event
+                # loop while removing them
+                await asyncio.get_event_loop().run_in_executor(
+                    None, shutil.rmtree, self.tmpdir)
+                self.tmpdir = None
 
         # Save date of last backup, only when backup succeeded
         for qid, vm_info in files_to_backup.items():
@@ -870,7 +1063,7 @@ async def handle_streams(stream_in, stream_out, size_limit=None,
         given copied data size (it should accumulate internally)
     :return: "size_limit" or None (no error)
     '''
-    buffer_size = 409600
+    buffer_size = STREAM_BUFFER_SIZE
     bytes_copied = 0
     while True:
         if size_limit:
@@ -22,12 +22,14 @@
 
 ''' This module contains pool implementations backed by file images'''
 import asyncio
+import concurrent.futures
 import errno
 import os
 import os.path
 import re
 import stat
 import subprocess
+import threading
 from contextlib import suppress
 
 import qubes.storage
@@ -604,10 +606,24 @@ def get_disk_usage_one(st):
         return st.st_size
 
 
+#: thread pool shared by all :py:func:`get_disk_usage` calls, so that many
+#: trees evaluated in one operation (like a single backup) reuse the same
+#: threads; created eagerly - ThreadPoolExecutor spawns no threads until
+#: the first submit, and this avoids a check-then-set race when the first
+#: calls arrive concurrently
+_disk_usage_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=8, thread_name_prefix='disk-usage')
+
+
 def get_disk_usage(path):
     '''Get real disk usage of given path (file or directory).
 
-    When *path* points to directory, then it is evaluated recursively.
+    When *path* points to directory, then it is evaluated recursively -
+    subdirectories are scanned concurrently on a thread pool shared between
+    all callers, so one stat-heavy traversal does not serialize the whole
+    operation. The traversal does not cross filesystem boundaries (like
+    'du -x'), so pseudo-filesystems or other mounts under the evaluated
+    tree are not walked.
 
     This function tries estimate real disk usage. See documentation of
     :py:func:`get_disk_usage_one`.
@@ -622,10 +638,55 @@ def get_disk_usage(path):
 
     ret = get_disk_usage_one(st)
 
-    # if path is not a directory, this is skipped
-    for dirpath, dirnames, filenames in os.walk(path):
-        for name in dirnames + filenames:
-            ret += get_disk_usage_one(os.lstat(os.path.join(dirpath, name)))
+    if not stat.S_ISDIR(st.st_mode):
+        return ret
+
+    executor = _disk_usage_executor
+    futures = []
+    futures_lock = threading.Lock()
+    root_dev = st.st_dev
+
+    def scan_dir(dirpath):
+        '''Sum usage of direct entries, queueing subdirectories back to
+        the pool.
+
+        The directory is opened just once and entries are stat-ed relative
+        to that file descriptor, so the kernel resolves only the leaf name
+        instead of re-walking the whole path for every entry.
+        '''
+        total = 0
+        try:
+            dir_fd = os.open(dirpath, os.O_RDONLY | os.O_DIRECTORY)
+        except OSError:
+            return total
+        try:
+            with os.scandir(dir_fd) as entries:
+                for entry in entries:
+                    try:
+                        entry_st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    total += get_disk_usage_one(entry_st)
+                    if stat.S_ISDIR(entry_st.st_mode) \
+                            and entry_st.st_dev == root_dev:
+                        with futures_lock:
+                            futures.append(executor.submit(
+                                scan_dir, os.path.join(dirpath, entry.name)))
+        finally:
+            os.close(dir_fd)
+        return total
+
+    with futures_lock:
+        futures.append(executor.submit(scan_dir, path))
+    # list may grow while iterating - workers queue subdirectories
+    done = 0
+    while True:
+        with futures_lock:
+            if done >= len(futures):
+                break
+            future = futures[done]
+        done += 1
+        ret += future.result()
 
     return ret
 
@@ -22,6 +22,7 @@ import os
 import subprocess
 import tarfile
 import io
+import zlib
 
 BUF_SIZE = 409600
 
@@ -132,6 +133,23 @@ def copy_sparse_data(input_stream, output_stream, sparse_map):
             if not read:
                 raise Exception('premature EOF')
 
+class GzipWriter:
+    '''Minimal file-like object compressing written data into gzip format
+    in-process with zlib, instead of piping through an external gzip
+    subprocess.'''
+    def __init__(self, output):
+        self._output = output
+        self._compressobj = zlib.compressobj(wbits=16 + zlib.MAX_WBITS)
+
+    def write(self, data):
+        compressed = self._compressobj.compress(bytes(data))
+        if compressed:
+            self._output.write(compressed)
+
+    def close(self):
+        self._output.write(self._compressobj.flush())
+
+
 def finalize(output):
     '''Write EOF blocks'''
     output.write(b'\0' * 512)
@@ -158,16 +176,21 @@ def main(args=None):
         with io.open(('/dev/stdout' if args.output_file == '-'
                       else args.output_file),
                      'wb') as output:
-            if args.use_compress_program:
+            compress = None
+            if args.use_compress_program == 'gzip':
+                # the default filter - compress in-process with zlib,
+                # saving a fork+exec and a pipe copy
+                output = GzipWriter(output)
+            elif args.use_compress_program:
                 # pylint: disable=consider-using-with
                 compress = subprocess.Popen([args.use_compress_program],
                     stdin=subprocess.PIPE, stdout=output)
                 output = compress.stdin
-            else:
-                compress = None
             output.write(tar_info.tobuf(tarfile.PAX_FORMAT))
             copy_sparse_data(input_file, output, sparse_map)
             finalize(output)
+            if isinstance(output, GzipWriter):
+                output.close()
     if compress is not None:
         compress.stdin.close()
         compress.wait()
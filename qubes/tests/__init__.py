@@ -1461,6 +1461,7 @@ def load_tests(loader, tests, pattern):  # pylint: disable=unused-argument
             'qubes.tests.vm.dispvm',
             'qubes.tests.app',
             'qubes.tests.tarwriter',
+            'qubes.tests.backup',
             'qubes.tests.api',
             'qubes.tests.api_admin',
             'qubes.tests.api_misc',
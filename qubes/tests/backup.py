@@ -0,0 +1,108 @@
+#
+# The Qubes OS Project, http://www.qubes-os.org
+#
+# Copyright (C) 2013-2017  Marek Marczykowski-Górecki
+#                                   <marmarek@invisiblethingslab.com>
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, see <https://www.gnu.org/licenses/>.
+#
+
+import asyncio
+import os
+import shutil
+import subprocess
+import tarfile
+import tempfile
+
+import qubes.backup
+import qubes.tests
+
+
+class TC_00_SendWorker(qubes.tests.QubesTestCase):
+    ''' Tests for the in-process outer archive writer of
+        :py:class:`qubes.backup.SendWorker` '''
+
+    def setUp(self):
+        super().setUp()
+        self.base_dir = tempfile.mkdtemp()
+        self.extract_dir = tempfile.mkdtemp()
+        self.output_path = tempfile.mktemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.base_dir)
+        shutil.rmtree(self.extract_dir)
+        if os.path.exists(self.output_path):
+            os.unlink(self.output_path)
+        super().tearDown()
+
+    def make_file(self, name, content):
+        path = os.path.join(self.base_dir, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(content)
+
+    def send_files(self, items):
+        '''Run SendWorker over *items* (filenames or batches of them),
+        writing the stream to self.output_path'''
+        queue = asyncio.Queue()
+        for item in items:
+            queue.put_nowait(item)
+        queue.put_nowait(qubes.backup.QUEUE_FINISHED)
+        with open(self.output_path, 'wb') as backup_target:
+            worker = qubes.backup.SendWorker(
+                queue, self.base_dir, backup_target)
+            self.loop.run_until_complete(worker.run())
+
+    def test_000_stream_extractable(self):
+        contents = {
+            'backup-header': b'version=4\n',
+            'backup-header.hmac': b'h' * 300,
+            'vm1/root.img.000.enc': os.urandom(100001),
+        }
+        for name, content in contents.items():
+            self.make_file(name, content)
+        self.send_files([('backup-header', 'backup-header.hmac'),
+                         'vm1/root.img.000.enc'])
+        # the restoring side reads the stream with a plain tar ignoring
+        # the per-batch end-of-archive markers
+        with self.assertNotRaises(subprocess.CalledProcessError):
+            subprocess.check_call(
+                ['tar', '-xi', '-f', self.output_path],
+                cwd=self.extract_dir)
+        for name, content in contents.items():
+            with open(os.path.join(self.extract_dir, name), 'rb') as f:
+                self.assertEqual(f.read(), content,
+                    'member {} corrupted'.format(name))
+            # staged file must be deleted after sending
+            self.assertFalse(
+                os.path.exists(os.path.join(self.base_dir, name)),
+                'staged file {} not removed'.format(name))
+
+    def test_001_record_alignment(self):
+        self.make_file('chunk', b'x' * 12345)
+        self.send_files(['chunk'])
+        # like tar, pad each archive to the record size
+        self.assertGreater(os.path.getsize(self.output_path), 0)
+        self.assertEqual(
+            os.path.getsize(self.output_path) % tarfile.RECORDSIZE, 0)
+
+    def test_002_empty_file(self):
+        self.make_file('empty', b'')
+        self.send_files(['empty'])
+        with self.assertNotRaises(subprocess.CalledProcessError):
+            subprocess.check_call(
+                ['tar', '-xi', '-f', self.output_path],
+                cwd=self.extract_dir)
+        self.assertEqual(
+            os.path.getsize(os.path.join(self.extract_dir, 'empty')), 0)
@@ -720,3 +720,59 @@ class TC_03_FilePool(qubes.tests.QubesTestCase):
         # :pylint: disable=invalid-name
         self.assertTrue(
             os.path.exists(path), "Path {!s} does not exist".format(path))
+
+
+class TC_04_GetDiskUsage(qubes.tests.QubesTestCase):
+    ''' Tests for the parallel scandir-based
+        :py:func:`qubes.storage.file.get_disk_usage` walker '''
+
+    def setUp(self):
+        super().setUp()
+        self.test_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+        super().tearDown()
+
+    @staticmethod
+    def du(path):
+        ''' Reference disk usage, as reported by coreutils du '''
+        return int(subprocess.check_output(
+            ['du', '-sx', '--block-size=1', path]).split()[0])
+
+    def test_000_tree(self):
+        os.makedirs(os.path.join(self.test_dir, 'a/b/c'))
+        with open(os.path.join(self.test_dir, 'f1'), 'wb') as f:
+            f.write(b'x' * 100000)
+        with open(os.path.join(self.test_dir, 'a/b/f2'), 'wb') as f:
+            f.write(b'y' * 5000)
+        # symlinks must be counted themselves, not followed
+        os.symlink('f1', os.path.join(self.test_dir, 'link'))
+        os.symlink('a', os.path.join(self.test_dir, 'dirlink'))
+        self.assertEqual(
+            qubes.storage.file.get_disk_usage(self.test_dir),
+            self.du(self.test_dir))
+
+    def test_001_single_file(self):
+        path = os.path.join(self.test_dir, 'file.img')
+        with open(path, 'wb') as f:
+            f.write(b'z' * 65537)
+        self.assertEqual(
+            qubes.storage.file.get_disk_usage(path),
+            self.du(path))
+
+    def test_002_sparse_file(self):
+        path = os.path.join(self.test_dir, 'sparse.img')
+        with open(path, 'wb') as f:
+            f.truncate(10 * 1024 * 1024)
+            f.seek(1024 * 1024)
+            f.write(b'd' * 4096)
+        self.assertEqual(
+            qubes.storage.file.get_disk_usage(path),
+            self.du(path))
+
+    def test_003_nonexistent(self):
+        self.assertEqual(
+            qubes.storage.file.get_disk_usage(
+                os.path.join(self.test_dir, 'missing')),
+            0)